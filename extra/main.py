@@ -1,13 +1,21 @@
+import io
 import os
-import json
 import logging
+import tempfile
 import traceback
-from datetime import datetime
-from typing import List, Dict, Any, Optional
-from flask import Flask, jsonify, request
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import chain
+from uuid import uuid4
+from typing import List, Dict, Any, BinaryIO, Iterable, Iterator, Optional, Tuple
+from flask import Flask, Response, request
 from google.cloud import storage
 from google.cloud import bigquery
-from google.cloud.exceptions import NotFound
+from google.cloud.exceptions import NotFound, PreconditionFailed
+import ijson
+import orjson
 import time
 
 # Configure logging with more detail
@@ -22,13 +30,40 @@ app = Flask(__name__)
 PROJECT_ID = "ofr-2kt-valo-reseau-1-lab-prd"
 BUCKET_NAME = "ofr-2kt-valo-enedis"
 FOLDER_PATH = "processed"
+# Only files whose name contains this substring are processed
+FILE_NAME_FILTER = os.environ.get("FILE_NAME_FILTER", "reseau_souterrain_hta")
+# The filter is embedded in a match_glob pattern, so it must be a non-empty
+# literal: an empty value would let "**" match into subfolders, and glob
+# characters or "/" would change what the pattern matches
+if not FILE_NAME_FILTER or any(c in FILE_NAME_FILTER for c in "*?[]{}\\/"):
+    raise ValueError(
+        f"FILE_NAME_FILTER must be a non-empty file name fragment without glob "
+        f"characters or '/', got {FILE_NAME_FILTER!r}"
+    )
 DATASET_ID = "ofr_2kt_enedis"
 ERROR_LOG_FILE = "geojson_processing_errors.log"
+ERROR_LOG_SHARD_PREFIX = "geojson_processing_errors/"
+ERROR_LOG_LOCK_FILE = "geojson_processing_errors.lock"
+# A compaction lock older than this (seconds) was left by a worker that died
+ERROR_LOG_LOCK_TIMEOUT = 600
+MAX_WORKERS = int(os.environ.get("MAX_WORKERS", 8))
 
-# BigQuery load job configuration
+# Object metadata actually read from listings: size is logged and splits the
+# range reads, generation pins those reads to the listed object
+LIST_BLOBS_FIELDS = "items(name,size,generation),nextPageToken"
+
+# Blobs are read as concurrent byte-range requests of this size, with at most
+# DOWNLOAD_WORKERS ranges in flight per file
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+DOWNLOAD_WORKERS = 4
+
+# GEOGRAPHY clustering lets spatial filters prune storage blocks
+CLUSTERING_FIELDS = ["geometry"]
+
+# BigQuery load job configuration; any rejected row fails the whole file
 LOAD_JOB_CONFIG = bigquery.LoadJobConfig(
     source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
-    max_bad_records=10,
+    max_bad_records=0,
     ignore_unknown_values=True,
 )
 
@@ -37,6 +72,7 @@ logger.info(f"Initializing clients for project: {PROJECT_ID}")
 try:
     storage_client = storage.Client(project=PROJECT_ID)
     bigquery_client = bigquery.Client(project=PROJECT_ID)
+    storage_bucket = storage_client.bucket(BUCKET_NAME)
     logger.info("Successfully initialized GCP clients")
 except Exception as e:
     logger.error(f"Failed to initialize GCP clients: {str(e)}")
@@ -44,51 +80,175 @@ except Exception as e:
 
 
 def log_error_to_bucket(error_msg: str):
-    """Log errors to a file in the bucket root."""
+    """Log errors to a small shard object, folded into the log file later."""
     try:
-        bucket = storage_client.bucket(BUCKET_NAME)
-        blob = bucket.blob(ERROR_LOG_FILE)
-
-        # Get existing log content if exists
-        existing_content = ""
-        try:
-            existing_content = blob.download_as_text()
-        except NotFound:
-            logger.info("No existing error log file, creating new one")
-
-        # Append new error with timestamp
+        # Write each entry as its own object instead of rewriting the log
         timestamp = datetime.utcnow().isoformat()
         new_entry = f"\n[{timestamp}] {error_msg}\n"
-        updated_content = existing_content + new_entry
-
-        # Upload updated log
-        blob.upload_from_string(updated_content)
+        blob = storage_bucket.blob(
+            f"{ERROR_LOG_SHARD_PREFIX}{timestamp}-{uuid4().hex}.log"
+        )
+        blob.upload_from_string(new_entry)
         logger.info(f"Error logged to bucket: {error_msg[:100]}...")
     except Exception as e:
         logger.error(f"Failed to log error to bucket: {str(e)}")
         logger.error(f"Original error was: {error_msg}")
 
 
-def safe_get_value(obj: Dict, path: str, default=None):
-    """Safely get nested dictionary values."""
+def acquire_error_log_lock() -> Optional[storage.Blob]:
+    """Create the error log compaction lock, or return None if it is held."""
+    lock_blob = storage_bucket.blob(ERROR_LOG_LOCK_FILE)
     try:
-        keys = path.split(".")
-        value = obj
-        for key in keys:
-            value = value.get(key, default)
-            if value is None:
-                return default
-        return value
-    except Exception:
-        return default
-
-
-def infer_schema_from_geojson(
-    features: List[Dict[str, Any]],
-) -> List[bigquery.SchemaField]:
-    """Infer BigQuery schema from GeoJSON features."""
-    logger.info(f"Inferring schema from {len(features)} features")
+        # Creation only succeeds while no lock object exists
+        lock_blob.upload_from_string("", if_generation_match=0)
+        return lock_blob
+    except PreconditionFailed:
+        pass
+
+    # Break a lock left behind by a worker that died mid-compaction; the
+    # shards are picked up by the next request
+    try:
+        lock_blob.reload()
+        lock_age = datetime.now(timezone.utc) - lock_blob.time_created
+        if lock_age.total_seconds() > ERROR_LOG_LOCK_TIMEOUT:
+            lock_blob.delete(if_generation_match=lock_blob.generation)
+            logger.warning("Removed stale error log compaction lock")
+    except (NotFound, PreconditionFailed):
+        pass
+    return None
+
+
+def compact_error_log():
+    """Append pending error shards to the log file with server-side compose.
+
+    Compaction is serialised across threads and workers by a lock object, so
+    only one caller folds shards in and deletes them at a time.
+    """
+    try:
+        # Cheap check first, so requests without errors never take the lock
+        pending = storage_bucket.list_blobs(
+            prefix=ERROR_LOG_SHARD_PREFIX, max_results=1, fields="items(name)"
+        )
+        if not any(pending):
+            return
+
+        lock_blob = acquire_error_log_lock()
+        if lock_blob is None:
+            logger.info("Error log is being compacted by another request")
+            return
+
+        try:
+            # List again under the lock; the previous holder may have
+            # compacted some of the shards seen above
+            shards = sorted(
+                storage_bucket.list_blobs(prefix=ERROR_LOG_SHARD_PREFIX),
+                key=lambda b: b.name,
+            )
 
+            # Pin each compose to the log generation last seen (0: no log yet)
+            # so a log changed outside this compaction is never overwritten
+            log_blob = storage_bucket.blob(ERROR_LOG_FILE)
+            try:
+                log_blob.reload()
+                generation = log_blob.generation
+            except NotFound:
+                generation = 0
+            compacted = 0
+
+            while shards:
+                # compose accepts at most 32 sources, the log file included
+                limit = 31 if generation else 32
+                batch, shards = shards[:limit], shards[limit:]
+                try:
+                    log_blob.compose(
+                        [log_blob, *batch] if generation else batch,
+                        if_generation_match=generation,
+                    )
+                except (PreconditionFailed, NotFound):
+                    # Leave the remaining shards for the next compaction
+                    logger.warning("Error log changed during compaction, stopping")
+                    break
+                generation = log_blob.generation
+
+                for shard in batch:
+                    shard.delete()
+                compacted += len(batch)
+
+            logger.info(f"Compacted {compacted} error entries into {ERROR_LOG_FILE}")
+        finally:
+            try:
+                lock_blob.delete(if_generation_match=lock_blob.generation)
+            except (NotFound, PreconditionFailed):
+                pass
+    except Exception as e:
+        logger.error(f"Failed to compact error log: {str(e)}")
+
+
+# Characters that are not allowed in BigQuery column names
+_FIELD_NAME_TABLE = str.maketrans({"-": "_", " ": "_", ".": "_"})
+
+
+def clean_field_name(key: str) -> str:
+    """Clean a property key to be a BigQuery compatible field name."""
+    return key.translate(_FIELD_NAME_TABLE)
+
+
+# Scalar property types, looked up by exact Python type
+_SCALAR_PROPERTY_TYPES = {
+    type(None): None,
+    bool: ("BOOLEAN", "NULLABLE"),
+    int: ("INTEGER", "NULLABLE"),
+    float: ("FLOAT", "NULLABLE"),
+    str: ("STRING", "NULLABLE"),
+}
+
+# Element types allowed in a REPEATED STRING property
+_STRING_ELEMENT_TYPES = {str, type(None)}
+
+
+def infer_property_type(value: Any) -> Optional[Tuple[str, str]]:
+    """Return the BigQuery (type, mode) for a single property value."""
+    # Parsed JSON scalars resolve with one dict lookup
+    value_type = type(value)
+    if value_type in _SCALAR_PROPERTY_TYPES:
+        return _SCALAR_PROPERTY_TYPES[value_type]
+
+    if isinstance(value, int):
+        return ("INTEGER", "NULLABLE")
+    elif isinstance(value, float):
+        return ("FLOAT", "NULLABLE")
+    elif isinstance(value, list):
+        # Check if it's a list of strings, collecting element types in C
+        if set(map(type, value)) <= _STRING_ELEMENT_TYPES:
+            return ("STRING", "REPEATED")
+        return ("JSON", "NULLABLE")
+    elif isinstance(value, dict):
+        return ("JSON", "NULLABLE")
+    return ("STRING", "NULLABLE")
+
+
+def merge_property_types(
+    current: Optional[Tuple[str, str]], inferred: Optional[Tuple[str, str]]
+) -> Optional[Tuple[str, str]]:
+    """Widen a property type so it can hold values of both types."""
+    if current is None or current == inferred:
+        return inferred
+    if inferred is None:
+        return current
+    if {current[0], inferred[0]} == {"INTEGER", "FLOAT"}:
+        return ("FLOAT", "NULLABLE")
+    if "JSON" in (current[0], inferred[0]) or "REPEATED" in (
+        current[1],
+        inferred[1],
+    ):
+        return ("JSON", "NULLABLE")
+    return ("STRING", "NULLABLE")
+
+
+def build_schema_fields(
+    property_types: Dict[str, Optional[Tuple[str, str]]],
+) -> List[bigquery.SchemaField]:
+    """Build the BigQuery schema from the property types seen in a file."""
     schema_fields = [
         bigquery.SchemaField("feature_id", "STRING", mode="NULLABLE"),
         bigquery.SchemaField("feature_type", "STRING", mode="NULLABLE"),
@@ -96,113 +256,88 @@ def infer_schema_from_geojson(
         bigquery.SchemaField("geometry", "GEOGRAPHY", mode="NULLABLE"),
     ]
 
-    # Analyze properties from all features to determine complete schema
-    property_types = {}
-    property_samples = {}
-
-    for i, feature in enumerate(features):
-        if i % 100 == 0:
-            logger.info(f"Analyzing feature {i}/{len(features)}")
-
-        if "properties" in feature and isinstance(feature["properties"], dict):
-            for key, value in feature["properties"].items():
-                if key not in property_samples:
-                    property_samples[key] = []
-                property_samples[key].append(value)
-
-                # Determine type based on all occurrences
-                if key not in property_types:
-                    if value is None:
-                        property_types[key] = ("STRING", "NULLABLE")
-                    elif isinstance(value, bool):
-                        property_types[key] = ("BOOLEAN", "NULLABLE")
-                    elif isinstance(value, int) and not isinstance(value, bool):
-                        property_types[key] = ("INTEGER", "NULLABLE")
-                    elif isinstance(value, float):
-                        property_types[key] = ("FLOAT", "NULLABLE")
-                    elif isinstance(value, list):
-                        # Check if it's a list of strings
-                        if all(
-                            isinstance(item, str) for item in value if item is not None
-                        ):
-                            property_types[key] = ("STRING", "REPEATED")
-                        else:
-                            property_types[key] = ("JSON", "NULLABLE")
-                    elif isinstance(value, dict):
-                        property_types[key] = ("JSON", "NULLABLE")
-                    else:
-                        property_types[key] = ("STRING", "NULLABLE")
-
     # Add property fields to schema
     logger.info(f"Found {len(property_types)} unique properties")
-    for field_name, (field_type, field_mode) in sorted(property_types.items()):
-        # Clean field name to be BigQuery compatible
-        clean_name = field_name.replace("-", "_").replace(" ", "_").replace(".", "_")
-        logger.debug(f"Adding field: {clean_name} ({field_type}, {field_mode})")
+    for field_name, property_type in sorted(property_types.items()):
+        # Properties that were always null default to STRING
+        field_type, field_mode = property_type or ("STRING", "NULLABLE")
+        logger.debug(f"Adding field: {field_name} ({field_type}, {field_mode})")
         schema_fields.append(
-            bigquery.SchemaField(f"{clean_name}", field_type, mode=field_mode)
+            bigquery.SchemaField(f"{field_name}", field_type, mode=field_mode)
         )
 
     return schema_fields
 
 
+@lru_cache(maxsize=1024)
+def _wkt_template(pair: str, count: int) -> str:
+    """Return the format string for `count` coordinate pairs."""
+    return ", ".join([pair] * count)
+
+
+def _coords_to_wkt(coords: List[List[float]], pair: str = "%s %s") -> str:
+    """Format a coordinate sequence as comma-separated WKT pairs."""
+    if set(map(len, coords)) != {2}:
+        # Drop incomplete positions and any Z/M values
+        coords = [c[:2] for c in coords if len(c) >= 2]
+    # One format call for the whole sequence instead of one f-string per vertex
+    return _wkt_template(pair, len(coords)) % tuple(chain.from_iterable(coords))
+
+
+def _rings_to_wkt(rings: List[List[List[float]]]) -> str:
+    """Format a list of rings or linestrings as "(...), (...)"."""
+    return ", ".join([f"({points})" for points in map(_coords_to_wkt, rings) if points])
+
+
+def _point_to_wkt(coords: List[float]) -> Optional[str]:
+    return f"POINT({coords[0]} {coords[1]})" if len(coords) >= 2 else None
+
+
+def _linestring_to_wkt(coords: List[List[float]]) -> Optional[str]:
+    points = _coords_to_wkt(coords)
+    return f"LINESTRING({points})" if points else None
+
+
+def _polygon_to_wkt(coords: List[List[List[float]]]) -> Optional[str]:
+    rings = _rings_to_wkt(coords)
+    return f"POLYGON({rings})" if rings else None
+
+
+def _multipoint_to_wkt(coords: List[List[float]]) -> Optional[str]:
+    points = _coords_to_wkt(coords, pair="(%s %s)")
+    return f"MULTIPOINT({points})" if points else None
+
+
+def _multilinestring_to_wkt(coords: List[List[List[float]]]) -> Optional[str]:
+    linestrings = _rings_to_wkt(coords)
+    return f"MULTILINESTRING({linestrings})" if linestrings else None
+
+
+def _multipolygon_to_wkt(coords: List[List[List[List[float]]]]) -> Optional[str]:
+    polygons = ", ".join(
+        [f"({rings})" for rings in map(_rings_to_wkt, coords) if rings]
+    )
+    return f"MULTIPOLYGON({polygons})" if polygons else None
+
+
+_WKT_BUILDERS = {
+    "POINT": _point_to_wkt,
+    "LINESTRING": _linestring_to_wkt,
+    "POLYGON": _polygon_to_wkt,
+    "MULTIPOINT": _multipoint_to_wkt,
+    "MULTILINESTRING": _multilinestring_to_wkt,
+    "MULTIPOLYGON": _multipolygon_to_wkt,
+}
+
+
 def convert_geometry_to_wkt(geometry: Dict[str, Any]) -> Optional[str]:
     """Convert GeoJSON geometry to WKT format."""
     try:
-        geom_type = geometry.get("type", "").upper()
-        coords = geometry.get("coordinates", [])
-
-        if geom_type == "POINT" and len(coords) >= 2:
-            return f"POINT({coords[0]} {coords[1]})"
-
-        elif geom_type == "LINESTRING" and coords:
-            # Ajout de virgules entre les paires de coordonnées
-            points = ", ".join([f"{c[0]} {c[1]}" for c in coords if len(c) >= 2])
-            return f"LINESTRING({points})" if points else None
-
-        elif geom_type == "POLYGON" and coords:
-            rings = []
-            for ring in coords:
-                if ring:
-                    # Ajout de virgules entre les paires de coordonnées
-                    points = ", ".join([f"{c[0]} {c[1]}" for c in ring if len(c) >= 2])
-                    if points:
-                        rings.append(f"({points})")
-            if rings:
-                return f"POLYGON({', '.join(rings)})"
-
-        elif geom_type == "MULTIPOINT" and coords:
-            # Ajout de virgules entre les points
-            points = ", ".join([f"({c[0]} {c[1]})" for c in coords if len(c) >= 2])
-            return f"MULTIPOINT({points})" if points else None
-
-        elif geom_type == "MULTILINESTRING" and coords:
-            linestrings = []
-            for ls in coords:
-                if ls:
-                    # Ajout de virgules entre les paires de coordonnées
-                    points = ", ".join([f"{c[0]} {c[1]}" for c in ls if len(c) >= 2])
-                    if points:
-                        linestrings.append(f"({points})")
-            if linestrings:
-                return f"MULTILINESTRING({', '.join(linestrings)})"
-
-        elif geom_type == "MULTIPOLYGON" and coords:
-            polygons = []
-            for polygon in coords:
-                rings = []
-                for ring in polygon:
-                    if ring:
-                        # Ajout de virgules entre les paires de coordonnées
-                        points = ", ".join(
-                            [f"{c[0]} {c[1]}" for c in ring if len(c) >= 2]
-                        )
-                        if points:
-                            rings.append(f"({points})")
-                if rings:
-                    polygons.append(f"({', '.join(rings)})")
-            if polygons:
-                return f"MULTIPOLYGON({', '.join(polygons)})"
+        builder = _WKT_BUILDERS.get(geometry.get("type", "").upper())
+        coords = geometry.get("coordinates") or []
+
+        if builder and coords:
+            return builder(coords)
 
     except Exception as e:
         logger.warning(f"Failed to convert geometry to WKT: {str(e)}")
@@ -211,30 +346,35 @@ def convert_geometry_to_wkt(geometry: Dict[str, Any]) -> Optional[str]:
 
 
 def convert_geojson_to_bigquery_rows(
-    geojson_data: Dict[str, Any],
-) -> List[Dict[str, Any]]:
-    """Convert GeoJSON features to BigQuery-compatible rows."""
-    rows = []
-    features = geojson_data.get("features", [])
-
-    logger.info(f"Converting {len(features)} features to BigQuery rows")
+    features: Iterable[Dict[str, Any]],
+    property_types: Dict[str, Optional[Tuple[str, str]]],
+) -> Iterator[Dict[str, Any]]:
+    """Convert GeoJSON features to BigQuery-compatible rows, one at a time.
+
+    The type of every property seen is merged into `property_types` (keyed by
+    cleaned field name) as rows are produced, so the schema is known once the
+    iterator is exhausted.
+    """
+    # Property keys repeat on every feature, so clean each one only once
+    field_names = {}
 
     for i, feature in enumerate(features):
-        if i % 100 == 0:
-            logger.info(f"Processing feature {i}/{len(features)}")
         try:
+            # Bind the lookup once and read each top-level member only once
+            get = feature.get
+            geometry = get("geometry")
+            feature_id = get("id")
+
             row = {
-                "feature_id": str(feature.get("id", f"feature_{i}")),
-                "feature_type": feature.get("type", "Feature"),
-                "geometry_json": (
-                    json.dumps(feature.get("geometry", {}))
-                    if feature.get("geometry")
-                    else None
+                "feature_id": (
+                    str(feature_id) if feature_id is not None else f"feature_{i}"
                 ),
+                "feature_type": get("type", "Feature"),
+                # Loaded as a JSON object, so it is not encoded a second time
+                "geometry_json": geometry or None,
             }
 
             # Convert geometry to WKT for GEOGRAPHY type
-            geometry = feature.get("geometry")
             if geometry:
                 wkt = convert_geometry_to_wkt(geometry)
                 if wkt:
@@ -246,64 +386,51 @@ def convert_geojson_to_bigquery_rows(
                 row["geometry"] = None
 
             # Flatten properties
-            properties = feature.get("properties", {})
+            properties = get("properties", {})
             if isinstance(properties, dict):
                 for key, value in properties.items():
                     # Clean field name
-                    clean_key = (
-                        key.replace("-", "_").replace(" ", "_").replace(".", "_")
+                    field_name = field_names.get(key)
+                    if field_name is None:
+                        field_name = field_names[key] = clean_field_name(key)
+
+                    property_types[field_name] = merge_property_types(
+                        property_types.get(field_name), infer_property_type(value)
                     )
-                    field_name = f"{clean_key}"
 
-                    # Handle different value types
-                    if value is None:
-                        row[field_name] = None
-                    elif isinstance(value, (list, dict)):
-                        # For complex types, keep as is (will be JSON)
-                        row[field_name] = value
-                    else:
-                        row[field_name] = value
+                    # Values go to orjson as is; lists and dicts become JSON
+                    row[field_name] = value
 
-            rows.append(row)
+            yield row
 
         except Exception as e:
             logger.error(f"Error processing feature {i}: {str(e)}")
-            logger.debug(f"Feature data: {json.dumps(feature)[:200]}...")
+            feature_data = orjson.dumps(feature, default=str).decode()
+            logger.debug(f"Feature data: {feature_data[:200]}...")
 
-    logger.info(f"Successfully converted {len(rows)} rows")
-    return rows
 
+def write_rows_to_ndjson(rows: Iterable[Dict[str, Any]], ndjson_file: BinaryIO) -> int:
+    """Write rows as newline-delimited JSON and rewind the file."""
+    row_count = 0
+    for row in rows:
+        ndjson_file.write(orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE))
+        row_count += 1
 
-def load_data_to_bigquery(
-    table_id: str, rows: List[Dict[str, Any]], schema: List[bigquery.SchemaField]
-) -> bool:
-    """Load data to BigQuery using the streaming API in batches."""
-    try:
-        logger.info(f"Loading {len(rows)} rows to {table_id}")
-
-        # Insert rows in batches to avoid timeouts
-        batch_size = 500
-        total_errors = []
+    ndjson_file.seek(0)
+    return row_count
 
-        for i in range(0, len(rows), batch_size):
-            batch = rows[i : i + batch_size]
-            logger.info(
-                f"Inserting batch {i//batch_size + 1}/{(len(rows) + batch_size - 1)//batch_size}"
-            )
 
-            errors = bigquery_client.insert_rows_json(table_id, batch)
-            if errors:
-                logger.error(f"Errors in batch {i//batch_size + 1}: {errors}")
-                total_errors.extend(errors)
-
-            # Small delay to avoid overwhelming the API
-            time.sleep(0.1)
+def load_data_to_bigquery(table_id: str, ndjson_file: BinaryIO) -> bool:
+    """Load NDJSON rows to BigQuery with a single load job."""
+    try:
+        logger.info(f"Loading rows to {table_id}")
 
-        if total_errors:
-            logger.error(f"Total errors during insertion: {len(total_errors)}")
-            return False
+        load_job = bigquery_client.load_table_from_file(
+            ndjson_file, table_id, job_config=LOAD_JOB_CONFIG
+        )
+        load_job.result()
 
-        logger.info(f"Successfully loaded all {len(rows)} rows")
+        logger.info(f"Successfully loaded {load_job.output_rows} rows")
         return True
 
     except Exception as e:
@@ -311,8 +438,68 @@ def load_data_to_bigquery(
         return False
 
 
-def process_geojson_file(bucket_name: str, blob_name: str) -> Dict[str, Any]:
-    """Process a single GeoJSON file and load it into BigQuery."""
+class RangedBlobReader(io.RawIOBase):
+    """Read-only stream over a blob that prefetches byte ranges concurrently.
+
+    Ranges are downloaded in order on a small thread pool and handed out as
+    they are read, so the parser works through one range while the next ones
+    download. Only DOWNLOAD_WORKERS ranges (plus the one being read) are held
+    at a time, whatever the blob size, and nothing is copied to disk.
+    """
+
+    def __init__(self, blob: storage.Blob):
+        super().__init__()
+        self._blob = blob
+        self._starts = iter(range(0, blob.size, DOWNLOAD_CHUNK_SIZE))
+        self._executor = ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS)
+        self._pending = deque()
+        self._buffer = memoryview(b"")
+        self._prefetch()
+
+    def _prefetch(self):
+        """Keep up to DOWNLOAD_WORKERS range downloads queued."""
+        while len(self._pending) < DOWNLOAD_WORKERS:
+            start = next(self._starts, None)
+            if start is None:
+                return
+            # Range ends are inclusive; the blob generation pins every range
+            end = min(start + DOWNLOAD_CHUNK_SIZE, self._blob.size) - 1
+            self._pending.append(
+                self._executor.submit(
+                    self._blob.download_as_bytes, start=start, end=end
+                )
+            )
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if not self._buffer:
+            if not self._pending:
+                return 0
+            self._buffer = memoryview(self._pending.popleft().result())
+            self._prefetch()
+
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def close(self):
+        if not self.closed:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._pending.clear()
+        super().close()
+
+
+def process_geojson_file(
+    bucket_name: str, blob_name: str, blob: Optional[storage.Blob] = None
+) -> Dict[str, Any]:
+    """Process a single GeoJSON file and load it into BigQuery.
+
+    `blob` may be passed straight from a listing that already carries the
+    object size and generation, which saves a metadata request.
+    """
     result = {
         "file": blob_name,
         "status": "success",
@@ -328,69 +515,73 @@ def process_geojson_file(bucket_name: str, blob_name: str) -> Dict[str, Any]:
 
         # Download GeoJSON file
         logger.info(f"Downloading file from gs://{bucket_name}/{blob_name}")
-        bucket = storage_client.bucket(bucket_name)
-        blob = bucket.blob(blob_name)
+        if blob is None:
+            bucket = (
+                storage_bucket
+                if bucket_name == BUCKET_NAME
+                else storage_client.bucket(bucket_name)
+            )
+            blob = bucket.blob(blob_name)
+            blob.reload()
 
         # Check file size
-        blob.reload()
         file_size_mb = blob.size / (1024 * 1024)
         logger.info(f"File size: {file_size_mb:.2f} MB")
 
-        geojson_content = blob.download_as_text()
-        logger.info(f"Downloaded {len(geojson_content)} characters")
-
-        # Parse GeoJSON
-        logger.info("Parsing GeoJSON data")
-        geojson_data = json.loads(geojson_content)
-        features = geojson_data.get("features", [])
-
-        if not features:
-            raise ValueError("No features found in GeoJSON")
-
-        logger.info(f"Found {len(features)} features in GeoJSON")
-
         # Extract table name from filename
         filename = os.path.basename(blob_name)
         table_name = os.path.splitext(filename)[0]
         table_name = table_name.replace("-", "_").replace(" ", "_").lower()
         logger.info(f"Target table name: {table_name}")
 
-        # Infer schema
-        logger.info("Inferring schema from features")
-        schema = infer_schema_from_geojson(features)
-        logger.info(f"Schema has {len(schema)} fields")
-
-        # Convert features to BigQuery rows
-        logger.info("Converting features to BigQuery format")
-        rows = convert_geojson_to_bigquery_rows(geojson_data)
-
-        if not rows:
-            raise ValueError("No rows were converted from features")
-
-        # Create or replace table
-        table_id = f"{PROJECT_ID}.{DATASET_ID}.{table_name}"
-
-        # Delete table if exists
-        try:
-            bigquery_client.delete_table(table_id)
-            logger.info(f"Deleted existing table: {table_id}")
-        except NotFound:
-            logger.info(f"Table {table_id} does not exist, creating new")
-
-        # Create new table
-        logger.info(f"Creating table {table_id} with {len(schema)} fields")
-        table = bigquery.Table(table_id, schema=schema)
-        table = bigquery_client.create_table(table)
-        logger.info(f"Created table: {table_id}")
-
-        # Load data
-        if rows:
-            success = load_data_to_bigquery(table_id, rows, schema)
+        # Rows are spooled as NDJSON, spilling to disk for large files. On Cloud
+        # Run /tmp is in memory, so size instances for MAX_WORKERS times the
+        # NDJSON of the largest file plus DOWNLOAD_WORKERS GeoJSON ranges per file
+        with tempfile.SpooledTemporaryFile(
+            max_size=64 * 1024 * 1024, mode="r+b"
+        ) as ndjson_file:
+            # Stream-parse features from concurrent range reads so parsing
+            # overlaps the download, converting them and inferring their schema
+            # in one pass
+            logger.info("Converting features to BigQuery format")
+            property_types = {}
+            with RangedBlobReader(blob) as f:
+                features = ijson.items(f, "features.item", use_float=True)
+                rows = convert_geojson_to_bigquery_rows(features, property_types)
+                row_count = write_rows_to_ndjson(rows, ndjson_file)
+
+            logger.info(f"Successfully converted {row_count} rows")
+
+            if not row_count:
+                raise ValueError("No rows were converted from features")
+
+            schema = build_schema_fields(property_types)
+            logger.info(f"Schema has {len(schema)} fields")
+
+            # Create or replace table
+            table_id = f"{PROJECT_ID}.{DATASET_ID}.{table_name}"
+
+            # Delete table if exists
+            try:
+                bigquery_client.delete_table(table_id)
+                logger.info(f"Deleted existing table: {table_id}")
+            except NotFound:
+                logger.info(f"Table {table_id} does not exist, creating new")
+
+            # Create new table
+            logger.info(f"Creating table {table_id} with {len(schema)} fields")
+            table = bigquery.Table(table_id, schema=schema)
+            table.clustering_fields = CLUSTERING_FIELDS
+            table = bigquery_client.create_table(table)
+            logger.info(f"Created table: {table_id}")
+
+            # Load data
+            success = load_data_to_bigquery(table_id, ndjson_file)
             if not success:
                 raise Exception("Failed to load data to BigQuery")
 
-            result["rows_processed"] = len(rows)
-            logger.info(f"Successfully processed {len(rows)} rows")
+        result["rows_processed"] = row_count
+        logger.info(f"Successfully processed {row_count} rows")
 
         result["processing_time"] = time.time() - start_time
         logger.info(f"Completed processing in {result['processing_time']:.2f} seconds")
@@ -406,6 +597,11 @@ def process_geojson_file(bucket_name: str, blob_name: str) -> Dict[str, Any]:
     return result
 
 
+def json_response(payload: Dict[str, Any]) -> Response:
+    """Serialize a response payload with orjson."""
+    return Response(orjson.dumps(payload), mimetype="application/json")
+
+
 @app.route("/", methods=["GET", "POST"])
 def process_geojson_files():
     """Main endpoint to process all GeoJSON files in the specified folder."""
@@ -425,41 +621,54 @@ def process_geojson_files():
     try:
         # List all files in the specified folder
         logger.info(f"Listing files in gs://{BUCKET_NAME}/{FOLDER_PATH}")
-        bucket = storage_client.bucket(BUCKET_NAME)
-
-        # Use delimiter to get only files in the root of the folder
-        blobs = bucket.list_blobs(prefix=f"{FOLDER_PATH}/", delimiter="/")
 
-        # Collect GeoJSON files
-        geojson_files = []
-        for blob in blobs:
+        # Filter names server-side; "*" does not match "/", so only files
+        # in the root of the folder are returned
+        blobs = storage_bucket.list_blobs(
+            prefix=f"{FOLDER_PATH}/",
+            match_glob=f"{FOLDER_PATH}/*{FILE_NAME_FILTER}*.geojson",
+            fields=LIST_BLOBS_FIELDS,
+        )
 
-            if "reseau_souterrain_hta" not in blob.name:
-                logger.info(f"Skipping non-position_geographique file: {blob.name}")
-                continue
-            if blob.name.endswith(".geojson"):
-                geojson_files.append(blob.name)
-                logger.info(f"Found GeoJSON file: {blob.name}")
+        # Collect GeoJSON files, logging each one only at debug level
+        geojson_files = list(blobs)
+        if logger.isEnabledFor(logging.DEBUG):
+            for blob in geojson_files:
+                logger.debug(f"Found GeoJSON file: {blob.name} ({blob.size} bytes)")
 
         results["total_files"] = len(geojson_files)
-        logger.info(f"Found {len(geojson_files)} GeoJSON files to process")
+        total_mb = sum(blob.size or 0 for blob in geojson_files) / (1024 * 1024)
+        logger.info(
+            f"Found {len(geojson_files)} GeoJSON files to process ({total_mb:.2f} MB)"
+        )
 
         if not geojson_files:
             logger.warning(
                 f"No GeoJSON files found in gs://{BUCKET_NAME}/{FOLDER_PATH}/"
             )
             results["message"] = "No GeoJSON files found in the specified folder"
-            return jsonify(results), 200
-
-        # Process each file
-        for idx, file_path in enumerate(geojson_files, 1):
-            logger.info(f"Processing file {idx}/{len(geojson_files)}: {file_path}")
-            process_result = process_geojson_file(BUCKET_NAME, file_path)
-
-            if process_result["status"] == "success":
-                results["processed_files"].append(process_result)
-            else:
-                results["failed_files"].append(process_result)
+            return json_response(results), 200
+
+        # Process files concurrently; each one is dominated by GCS/BigQuery I/O
+        max_workers = min(MAX_WORKERS, len(geojson_files))
+        logger.info(f"Processing {len(geojson_files)} files with {max_workers} workers")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(process_geojson_file, BUCKET_NAME, blob.name, blob)
+                for blob in geojson_files
+            ]
+
+            # Results are only collected here, on the request thread
+            for idx, future in enumerate(as_completed(futures), 1):
+                process_result = future.result()
+                logger.info(
+                    f"Finished file {idx}/{len(geojson_files)}: {process_result['file']}"
+                )
+
+                if process_result["status"] == "success":
+                    results["processed_files"].append(process_result)
+                else:
+                    results["failed_files"].append(process_result)
 
         results["end_time"] = datetime.utcnow().isoformat()
 
@@ -490,8 +699,9 @@ def process_geojson_files():
             log_error_to_bucket(summary_msg)
             for failed in results["failed_files"]:
                 log_error_to_bucket(f"Failed: {failed['file']} - {failed['error']}")
+        compact_error_log()
 
-        return jsonify(results), 200
+        return json_response(results), 200
 
     except Exception as e:
         error_msg = (
@@ -499,9 +709,10 @@ def process_geojson_files():
         )
         logger.error(error_msg)
         log_error_to_bucket(error_msg)
+        compact_error_log()
         results["error"] = str(e)
         results["status"] = "error"
-        return jsonify(results), 500
+        return json_response(results), 500
 
 
 @app.route("/health", methods=["GET"])
@@ -512,11 +723,10 @@ def health_check():
         bigquery_client.query("SELECT 1").result()
 
         # Test Storage connection
-        bucket = storage_client.bucket(BUCKET_NAME)
-        bucket.exists()
+        storage_bucket.exists()
 
         return (
-            jsonify(
+            json_response(
                 {
                     "status": "healthy",
                     "project_id": PROJECT_ID,
@@ -529,7 +739,7 @@ def health_check():
         )
     except Exception as e:
         logger.error(f"Health check failed: {str(e)}")
-        return jsonify({"status": "unhealthy", "error": str(e)}), 503
+        return json_response({"status": "unhealthy", "error": str(e)}), 503
 
 
 @app.route("/test", methods=["GET"])
@@ -537,15 +747,19 @@ def test_endpoint():
     """Test endpoint to verify configuration."""
     try:
         # List first few files
-        bucket = storage_client.bucket(BUCKET_NAME)
         blobs = list(
-            bucket.list_blobs(prefix=f"{FOLDER_PATH}/", delimiter="/", max_results=5)
+            storage_bucket.list_blobs(
+                prefix=f"{FOLDER_PATH}/",
+                delimiter="/",
+                max_results=5,
+                fields="items(name),nextPageToken",
+            )
         )
 
         files = [blob.name for blob in blobs if blob.name.endswith(".geojson")]
 
         return (
-            jsonify(
+            json_response(
                 {
                     "status": "ok",
                     "config": {
@@ -561,10 +775,12 @@ def test_endpoint():
             200,
         )
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}), 500
 
 
 if __name__ == "__main__":
+    # Local development only; deployments serve `app` through gunicorn with
+    # threaded workers (see Procfile) so /health stays responsive during ingest
     port = int(os.environ.get("PORT", 8080))
-    logger.info(f"Starting Flask app on port {port}")
+    logger.info(f"Starting Flask development server on port {port}")
     app.run(host="0.0.0.0", port=port)
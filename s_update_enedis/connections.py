@@ -1,17 +1,24 @@
 """Optimized connections calculation for electrical grid components."""
 
 import logging
-from typing import Dict, List
+from typing import Dict
 import geopandas as gpd
-from shapely.geometry import Point
+import numpy as np
 import pandas as pd
-import time
+import shapely
 from config import LAYERS
 from exporter import save_layer
 
 logger = logging.getLogger(__name__)
 
 
+def parse_connections(value) -> list:
+    """Turn a connections field read back by pyogrio into a list of ids."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return value if isinstance(value, list) else []
+
+
 def load_processed_layer(layer_key: str) -> gpd.GeoDataFrame:
     """Load a previously processed layer from the individual output folder."""
     from pathlib import Path
@@ -22,6 +29,8 @@ def load_processed_layer(layer_key: str) -> gpd.GeoDataFrame:
     if layer_file.exists():
         try:
             gdf = gpd.read_file(layer_file)
+            if "connections" in gdf.columns:
+                gdf["connections"] = gdf["connections"].map(parse_connections)
             logger.info(
                 f"Loaded previously processed layer {layer_key} from {layer_file}"
             )
@@ -34,9 +43,26 @@ def load_processed_layer(layer_key: str) -> gpd.GeoDataFrame:
 
 def check_processed_layers() -> Dict[str, gpd.GeoDataFrame]:
     """Check which layers have already been processed and load them."""
+    from pathlib import Path
+    import os
+
     processed_layers = {}
 
+    individual_path = Path("../output/individual")
+    if not individual_path.is_dir():
+        return processed_layers
+
+    # Scan the folder once instead of probing one path per layer
+    with os.scandir(individual_path) as entries:
+        available = {
+            entry.name[: -len(".geojson")]
+            for entry in entries
+            if entry.name.endswith(".geojson") and entry.is_file()
+        }
+
     for layer_key in LAYERS.keys():
+        if layer_key not in available:
+            continue
         processed_gdf = load_processed_layer(layer_key)
         if processed_gdf is not None:
             processed_layers[layer_key] = processed_gdf
@@ -58,9 +84,11 @@ def cleanup_individual_files():
 
     if individual_path.exists():
         try:
-            for file in individual_path.glob("*.geojson"):
-                os.remove(file)
-                logger.info(f"Cleaned up individual file: {file}")
+            with os.scandir(individual_path) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".geojson") and entry.is_file():
+                        os.remove(entry.path)
+                        logger.info(f"Cleaned up individual file: {entry.path}")
 
             # Remove the directory if it's empty
             if not any(individual_path.iterdir()):
@@ -71,118 +99,106 @@ def cleanup_individual_files():
             logger.warning(f"Failed to clean up individual files: {e}")
 
 
-def get_endpoint_connections(
-    endpoint: Point,
-    candidates: gpd.GeoDataFrame,
-    layer_config,
-    feature_layer: str,
-    max_connections: int = 10,
-) -> List[str]:
-    """Find connections for a single endpoint based on electrical grid hierarchy."""
-    if candidates.empty:
-        return []
-
-    distances = candidates.geometry.distance(endpoint)
-    candidates = candidates.copy()
-    candidates["distance"] = distances
-    candidates = candidates[candidates["distance"] <= layer_config.connection_radius]
-
-    if candidates.empty:
-        return []
-
-    allowed_layers = set(layer_config.can_connect_to)
-    candidates = candidates[candidates["layer"].isin(allowed_layers)]
-
-    if candidates.empty:
-        return []
-
-    candidates["priority"] = candidates["layer"].map(
-        lambda x: LAYERS[x].priority if x in LAYERS else 999
-    )
-    candidates = candidates.sort_values(["priority", "distance"])
-
-    valid_connections = []
-    for _, candidate in candidates.iterrows():
-        candidate_layer = candidate["layer"]
-        candidate_config = LAYERS.get(candidate_layer)
-
-        if candidate_config and feature_layer in candidate_config.can_connect_to:
-            valid_connections.append(candidate["id"])
-
-            if len(valid_connections) >= max_connections:
-                break
-
-    return valid_connections
-
-
 def calculate_layer_connections(
-    gdf: gpd.GeoDataFrame, all_features: gpd.GeoDataFrame, layer_key: str
+    gdf: gpd.GeoDataFrame,
+    layer_key: str,
+    all_features_proj: gpd.GeoDataFrame,
+    tree: shapely.STRtree,
+    layer_rows: np.ndarray,
 ) -> gpd.GeoDataFrame:
-    """Calculate connections for all features in a layer."""
-    layer_config = LAYERS[layer_key]
-
-    gdf_proj = gdf.to_crs("EPSG:3857")
-    all_features_proj = all_features.to_crs("EPSG:3857")
-
-    spatial_index = all_features_proj.sindex
-
-    connections_list = []
-
-    for idx, feature in gdf_proj.iterrows():
-        geom = feature.geometry
-        feature_id = feature["id"]
-
-        search_radius = layer_config.connection_radius * 1.5
-
-        if geom.geom_type == "LineString":
-            start_point = Point(geom.coords[0])
-            end_point = Point(geom.coords[-1])
+    """Calculate connections for all features in a layer.
 
-            start_buffer = start_point.buffer(search_radius)
-            start_candidates_idx = list(spatial_index.intersection(start_buffer.bounds))
-            start_candidates = all_features_proj.iloc[start_candidates_idx]
-            start_candidates = start_candidates[start_candidates["id"] != feature_id]
+    Lines connect at both endpoints, other geometries at their point or
+    centroid. All endpoints are matched against all features with a single
+    bulk STRtree query, then the best candidates of each endpoint are picked
+    by (priority, distance) with array operations.
 
-            end_buffer = end_point.buffer(search_radius)
-            end_candidates_idx = list(spatial_index.intersection(end_buffer.bounds))
-            end_candidates = all_features_proj.iloc[end_candidates_idx]
-            end_candidates = end_candidates[end_candidates["id"] != feature_id]
+    Args:
+        gdf: Layer to calculate connections for
+        layer_key: Key of the layer in LAYERS
+        all_features_proj: All layers merged and projected to EPSG:3857, with a
+            categorical "layer" column
+        tree: STRtree over the geometries of all_features_proj
+        layer_rows: Positions of the layer's features in all_features_proj
+    """
+    layer_config = LAYERS[layer_key]
 
-            start_conns = get_endpoint_connections(
-                start_point,
-                start_candidates,
-                layer_config,
-                layer_key,
-                max_connections=2,
-            )
-            end_conns = get_endpoint_connections(
-                end_point, end_candidates, layer_config, layer_key, max_connections=2
-            )
+    all_geoms = np.asarray(all_features_proj.geometry.array)
+    geoms = all_geoms[layer_rows]
 
-            all_conns = list(set(start_conns + end_conns))
-            connections_list.append(all_conns)
+    is_line = shapely.get_type_id(geoms) == shapely.GeometryType.LINESTRING
+    line_idx = np.flatnonzero(is_line)
+    other_idx = np.flatnonzero(~is_line)
 
-        else:
-            point = geom if geom.geom_type == "Point" else geom.centroid
+    max_conns = (
+        100
+        if layer_key.startswith("postes")
+        else (5 if layer_key.endswith("bt") else 20)
+    )
 
-            buffer = point.buffer(search_radius)
-            candidates_idx = list(spatial_index.intersection(buffer.bounds))
-            candidates = all_features_proj.iloc[candidates_idx]
-            candidates = candidates[candidates["id"] != feature_id]
+    # One query point per line end and per other feature, with its owner row
+    query_points = np.concatenate(
+        [
+            shapely.get_point(geoms[line_idx], 0),
+            shapely.get_point(geoms[line_idx], -1),
+            shapely.centroid(geoms[other_idx]),
+        ]
+    )
+    query_owner = np.concatenate([line_idx, line_idx, other_idx])
+    query_limit = np.concatenate(
+        [np.full(2 * len(line_idx), 2), np.full(len(other_idx), max_conns)]
+    )
 
-            max_conns = (
-                100
-                if layer_key.startswith("postes")
-                else (5 if layer_key.endswith("bt") else 20)
-            )
+    query_pos, cand_pos = tree.query(
+        query_points, predicate="dwithin", distance=layer_config.connection_radius
+    )
 
-            connections = get_endpoint_connections(
-                point, candidates, layer_config, layer_key, max_connections=max_conns
-            )
-            connections_list.append(connections)
+    # Per-layer lookups indexed by the categorical layer code of each row
+    layer_codes = all_features_proj["layer"].cat.codes.to_numpy()
+    layer_names = all_features_proj["layer"].cat.categories
+    connectable_by_code = np.array(
+        [
+            name in layer_config.can_connect_to
+            and layer_key in LAYERS[name].can_connect_to
+            for name in layer_names
+        ],
+        dtype=bool,
+    )
+    priority_by_code = np.array(
+        [LAYERS[name].priority if name in LAYERS else 999 for name in layer_names]
+    )
 
-    gdf_proj["connections"] = connections_list
-    result = gdf_proj.to_crs(gdf.crs)
+    # Drop self matches and layers that cannot connect in both directions
+    candidate_codes = layer_codes[cand_pos]
+    keep = (cand_pos != layer_rows[query_owner[query_pos]]) & connectable_by_code[
+        candidate_codes
+    ]
+    query_pos, cand_pos = query_pos[keep], cand_pos[keep]
+
+    # Sort candidates by query point, then priority, then distance
+    distances = shapely.distance(query_points[query_pos], all_geoms[cand_pos])
+    priorities = priority_by_code[candidate_codes[keep]]
+    order = np.lexsort((distances, priorities, query_pos))
+    query_pos, cand_pos = query_pos[order], cand_pos[order]
+
+    # Keep the first `limit` candidates of each query point
+    group_starts = np.flatnonzero(np.diff(query_pos, prepend=-1))
+    group_sizes = np.diff(np.append(group_starts, len(query_pos)))
+    rank = np.arange(len(query_pos)) - np.repeat(group_starts, group_sizes)
+    selected = rank < query_limit[query_pos]
+
+    all_ids = all_features_proj["id"].to_numpy()
+    connections_list = [[] for _ in range(len(gdf))]
+    for owner, connection_id in zip(
+        query_owner[query_pos[selected]].tolist(), all_ids[cand_pos[selected]].tolist()
+    ):
+        connections_list[owner].append(connection_id)
+
+    # Both ends of a short line can reach the same candidate
+    connections_list = [list(dict.fromkeys(conns)) for conns in connections_list]
+
+    result = gdf.copy(deep=False)
+    result["connections"] = connections_list
 
     total_connections = sum(len(c) for c in connections_list)
     logger.info(
@@ -216,6 +232,18 @@ def process_all_connections(
         pd.concat(layers.values(), ignore_index=True), crs=list(layers.values())[0].crs
     )
 
+    # Project the merged network and index it once, shared by every layer
+    all_features_proj = all_features.to_crs("EPSG:3857")
+    all_features_proj["layer"] = all_features_proj["layer"].astype("category")
+    tree = shapely.STRtree(np.asarray(all_features_proj.geometry.array))
+
+    # Rows of each layer inside the merged frame, in concatenation order
+    layer_rows = {}
+    offset = 0
+    for layer_key, gdf in layers.items():
+        layer_rows[layer_key] = np.arange(offset, offset + len(gdf))
+        offset += len(gdf)
+
     priority_order = sorted(layers.keys(), key=lambda x: LAYERS[x].priority)
     updated_layers = {}
 
@@ -230,10 +258,11 @@ def process_all_connections(
         gdf = layers[layer_key]
         # print layer key
         print(f"Processing connections for {layer_key}")
-        time.sleep(20)  # Simulate processing time
 
         try:
-            updated_gdf = calculate_layer_connections(gdf, all_features, layer_key)
+            updated_gdf = calculate_layer_connections(
+                gdf, layer_key, all_features_proj, tree, layer_rows[layer_key]
+            )
             updated_layers[layer_key] = updated_gdf
 
             # Save the updated layer to an output_individual folder immediately
@@ -246,7 +275,7 @@ def process_all_connections(
             logger.error(f"Failed to process layer {layer_key}: {e}")
             # If processing fails, try to use the original layer without connections
             logger.warning(f"Using original layer {layer_key} without connections")
-            gdf_copy = gdf.copy()
+            gdf_copy = gdf.copy(deep=False)
             gdf_copy["connections"] = [[] for _ in range(len(gdf_copy))]
             updated_layers[layer_key] = gdf_copy
 
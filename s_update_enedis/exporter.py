@@ -52,7 +52,7 @@ def save_to_local_storage(
 
     # Save as GeoJSON
     output_path = local_output_dir / f"{layer_key}.geojson"
-    gdf_wgs84.to_file(output_path, driver="GeoJSON")
+    gdf_wgs84.to_file(output_path, driver="GeoJSON", engine="pyogrio")
 
     logger.info(f"Saved {layer_key} to {output_path}")
     return str(output_path)
@@ -111,14 +111,11 @@ def export_statistics_to_cloud(layers: Dict[str, gpd.GeoDataFrame]):
     stats = {}
 
     for layer_key, gdf in layers.items():
+        total_connections = int(gdf["connections"].map(len).sum())
         layer_stats = {
             "feature_count": len(gdf),
-            "total_connections": sum(len(f["connections"]) for _, f in gdf.iterrows()),
-            "avg_connections": (
-                sum(len(f["connections"]) for _, f in gdf.iterrows()) / len(gdf)
-                if len(gdf) > 0
-                else 0
-            ),
+            "total_connections": total_connections,
+            "avg_connections": total_connections / len(gdf) if len(gdf) > 0 else 0,
             "geometry_types": gdf.geometry.geom_type.value_counts().to_dict(),
         }
         stats[layer_key] = layer_stats
@@ -150,14 +147,11 @@ def export_statistics_to_local(layers: Dict[str, gpd.GeoDataFrame]):
     stats = {}
 
     for layer_key, gdf in layers.items():
+        total_connections = int(gdf["connections"].map(len).sum())
         layer_stats = {
             "feature_count": len(gdf),
-            "total_connections": sum(len(f["connections"]) for _, f in gdf.iterrows()),
-            "avg_connections": (
-                sum(len(f["connections"]) for _, f in gdf.iterrows()) / len(gdf)
-                if len(gdf) > 0
-                else 0
-            ),
+            "total_connections": total_connections,
+            "avg_connections": total_connections / len(gdf) if len(gdf) > 0 else 0,
             "geometry_types": gdf.geometry.geom_type.value_counts().to_dict(),
         }
         stats[layer_key] = layer_stats
@@ -1,14 +1,13 @@
 """Load electrical grid data from Google Cloud Storage or local files."""
 
-import json
 import logging
 import os
+import orjson
 import pandas as pd
 import geopandas as gpd
 from shapely.geometry import shape
 from typing import Dict
 from google.cloud import storage
-import io
 
 from config import (
     LAYERS,
@@ -39,15 +38,15 @@ def load_csv_from_cloud(layer_key: str) -> gpd.GeoDataFrame:
     if not blob.exists():
         raise FileNotFoundError(f"CSV file not found in cloud: {blob_path}")
 
-    # Download CSV content
-    csv_content = blob.download_as_text(encoding="utf-8")
-    df = pd.read_csv(io.StringIO(csv_content), delimiter=";", encoding="utf-8")
+    # Stream CSV content straight into the parser
+    with blob.open("rb") as csv_stream:
+        df = pd.read_csv(csv_stream, delimiter=";", encoding="utf-8")
 
     # Process geometries
     geometries = []
     for geojson_str in df["geo_shape"]:
         try:
-            geo_dict = json.loads(geojson_str)
+            geo_dict = orjson.loads(geojson_str)
             geometries.append(shape(geo_dict))
         except:
             geometries.append(None)
@@ -90,7 +89,7 @@ def load_csv_from_local(layer_key: str) -> gpd.GeoDataFrame:
     geometries = []
     for geojson_str in df["geo_shape"]:
         try:
-            geo_dict = json.loads(geojson_str)
+            geo_dict = orjson.loads(geojson_str)
             geometries.append(shape(geo_dict))
         except:
             geometries.append(None)
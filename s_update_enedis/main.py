@@ -124,8 +124,7 @@ def main(data_source: str = "local", output_destination: str = "local"):
         )
 
         total_connections = sum(
-            sum(len(feature["connections"]) for _, feature in gdf.iterrows())
-            for gdf in connected_layers.values()
+            int(gdf["connections"].map(len).sum()) for gdf in connected_layers.values()
         )
         performance_stats["total_connections"] = total_connections
         performance_stats["avg_connections_per_feature"] = (